@@ -20,6 +20,10 @@
 # degrees-of-freedom is demonstrated.
 
 # +
+import ctypes
+import importlib
+import sys
+import tempfile
 from pathlib import Path
 
 from mpi4py import MPI
@@ -29,7 +33,10 @@ import cffi
 import numba
 import numba.core.typing.cffi_utils as cffi_support
 import numpy as np
+from scipy.linalg import cho_factor, cho_solve
 
+import ffcx
+import ffcx.codegeneration.jit
 import ufl
 from basix.ufl import element
 from dolfinx import default_real_type, geometry
@@ -40,7 +47,7 @@ from dolfinx.fem import (Form, Function, IntegralType, dirichletbc, form,
 from dolfinx.fem.petsc import (apply_lifting, assemble_matrix, assemble_vector,
                                set_bc)
 from dolfinx.io import XDMFFile
-from dolfinx.jit import ffcx_jit
+from dolfinx.jit import get_options, mpi_jit_decorator
 from dolfinx.mesh import locate_entities_boundary, meshtags
 
 if default_real_type == np.float32:
@@ -87,43 +94,61 @@ bc = dirichletbc(u_bc, bdofs)
 E, nu = 1.0, 1.0 / 3.0
 
 
+def sigma_c(s):
+    """Plane-stress constitutive map applied to a symmetric tensor"""
+    return E / (1. - nu ** 2) * ((1. - nu) * s + nu * ufl.Identity(2) * ufl.tr(s))
+
+
 def sigma_u(u):
     """Constitutive relation for stress-strain. Assuming plane-stress in XY"""
     eps = 0.5 * (ufl.grad(u) + ufl.grad(u).T)
-    sigma = E / (1. - nu ** 2) * ((1. - nu) * eps + nu * ufl.Identity(2) * ufl.tr(eps))
-    return sigma
-
-
-a00 = ufl.inner(sigma, tau) * ufl.dx
-a10 = - ufl.inner(sigma, ufl.grad(v)) * ufl.dx
+    return sigma_c(eps)
+
+
+# Writing the displacement strains in the DG stress basis (exact,
+# since the strains of P2 displacements are piecewise linear), the
+# mixed-system blocks satisfy A10 = -D^T M and A01 = -M_C D, with M
+# the stress mass matrix, M_C the constitutive-weighted mass matrix
+# and D the strain expansion coefficients. The condensed tensor
+# -A10 M^{-1} A01 = -D^T M_C D then equals -A01^T M_C^{-1} A01, so
+# only A01 and the weighted mass block a00 need to be tabulated and
+# the Schur complement is symmetric by construction.
+a00 = ufl.inner(sigma_c(sigma), tau) * ufl.dx
 a01 = - ufl.inner(sigma_u(u), tau) * ufl.dx
 
 f = ufl.as_vector([0.0, 1.0 / 16])
 b1 = form(- ufl.inner(f, v) * ds(1))
 
-# JIT compile individual blocks tabulation kernels
-nptype, ffcxtype = None, None
-if PETSc.ScalarType == np.float32:  # type: ignore
-    nptype = "float32"
-    ffcxtype = "float"
-elif PETSc.ScalarType == np.float64:  # type: ignore
-    nptype = "float64"
-    ffcxtype = "double"
-elif PETSc.ScalarType == np.complex64:  # type: ignore
-    nptype = "complex64"
-    ffcxtype = "float _Complex"
-elif PETSc.ScalarType == np.complex128:  # type: ignore
-    nptype = "complex128"
-    ffcxtype = "double _Complex"
-else:
+# JIT compile individual blocks tabulation kernels. The scalar type
+# determines the FFCx/Numpy type names and the Form class through
+# lookup tables rather than chains of dtype comparisons.
+try:
+    nptype, ffcxtype, formtype = {
+        np.float32: ("float32", "float", Form_float32),
+        np.float64: ("float64", "double", Form_float64),
+        np.complex64: ("complex64", "float _Complex", Form_complex64),
+        np.complex128: ("complex128", "double _Complex", Form_complex128),
+    }[np.dtype(PETSc.ScalarType).type]  # type: ignore
+except KeyError:
     raise RuntimeError(f"Unsupported scalar type {PETSc.ScalarType}.")  # type: ignore
 
-ufcx_form00, _, _ = ffcx_jit(msh.comm, a00, form_compiler_options={"scalar_type": ffcxtype})
+# C type of the geometry (real) scalar
+ffcx_realtype = "float" if PETSc.RealType == np.float32 else "double"  # type: ignore
+
+# The two blocks share elements, Jacobian and quadrature geometry,
+# so compile them as one FFCx compilation unit: the shared tables and
+# geometry code are generated and the C compiler is invoked only once.
+
+
+@mpi_jit_decorator
+def compile_block_forms(forms, scalar_type):
+    return ffcx.codegeneration.jit.compile_forms(
+        forms, options=ffcx.get_options({"scalar_type": scalar_type}), **get_options())
+
+
+(ufcx_form00, ufcx_form01), _, _ = compile_block_forms(msh.comm, [a00, a01], ffcxtype)
 kernel00 = getattr(ufcx_form00.form_integrals[0], f"tabulate_tensor_{nptype}")
-ufcx_form01, _, _ = ffcx_jit(msh.comm, a01, form_compiler_options={"scalar_type": ffcxtype})
 kernel01 = getattr(ufcx_form01.form_integrals[0], f"tabulate_tensor_{nptype}")
-ufcx_form10, _, _ = ffcx_jit(msh.comm, a10, form_compiler_options={"scalar_type": ffcxtype})
-kernel10 = getattr(ufcx_form10.form_integrals[0], f"tabulate_tensor_{nptype}")
 
 ffi = cffi.FFI()
 cffi_support.register_type(ffi.typeof('double _Complex'), numba.types.complex128)
@@ -136,47 +161,250 @@ c_signature = numba.types.void(
     numba.types.CPointer(numba.types.uint8))
 
 
-@numba.cfunc(c_signature, nopython=True)
-def tabulate_condensed_tensor_A(A_, w_, c_, coords_, entity_local_index, permutation=ffi.NULL):
-    # Prepare target condensed local element tensor
-    A = numba.carray(A_, (Usize, Usize), dtype=PETSc.ScalarType)
-
-    # Tabulate all sub blocks locally
-    A00 = np.zeros((Ssize, Ssize), dtype=PETSc.ScalarType)
-    kernel00(ffi.from_buffer(A00), w_, c_, coords_, entity_local_index, permutation)
-
-    A01 = np.zeros((Ssize, Usize), dtype=PETSc.ScalarType)
-    kernel01(ffi.from_buffer(A01), w_, c_, coords_, entity_local_index, permutation)
+# Tabulate the weighted stress mass block A00 once on the reference
+# cell. The mesh mapping is affine, so on every cell
+# A00 = |det J| * A00_ref and a single factorization of A00_ref can be
+# reused: the per-cell work reduces to a triangular solve plus a
+# 1/|det J| scaling.
+coords_ref = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0]],
+                      dtype=PETSc.RealType)  # type: ignore
+entity_ref = np.array([0], dtype=np.intc)
+perm_ref = np.array([0], dtype=np.uint8)
+A00_ref = np.zeros((Ssize, Ssize), dtype=PETSc.ScalarType)
+kernel00(ffi.cast(f"{ffcxtype} *", A00_ref.ctypes.data), ffi.NULL, ffi.NULL,
+         ffi.cast(f"{ffcx_realtype} *", coords_ref.ctypes.data),
+         ffi.cast("int *", entity_ref.ctypes.data),
+         ffi.cast("uint8_t *", perm_ref.ctypes.data))
+
+# A00 is a (scaled, constitutive-weighted) mass matrix and hence
+# symmetric positive definite, so a Cholesky factorization (half the
+# flops of LU, no pivoting) suffices. Column-major factor, as BLAS
+# expects it.
+_chol = cho_factor(A00_ref, lower=True)
+chol00 = np.asfortranarray(_chol[0])
+
+# Address of the coupling-block kernel, re-bound through ctypes with
+# void-pointer arguments for the batched Numba driver below: calling
+# the CFFI binding from Numba allocates a CFFI buffer object per
+# argument on every cell, while the ctypes binding is called with raw
+# `.ctypes.data` addresses that Numba lowers to plain pointer loads.
+_p = ctypes.c_void_p
+kernel01_addr = int(ffi.cast("uintptr_t", kernel01))
+kernel01_c = ctypes.CFUNCTYPE(None, _p, _p, _p, _p, _p, _p)(kernel01_addr)
+
+# The per-cell condensed kernel (used below for boundary lifting,
+# which tabulates cell-by-cell) is generated as plain C and compiled
+# once through CFFI. With A00 = |det J| L L^T the condensed tensor is
+# -W^T W / |det J| with W = L^{-1} A01; the block sizes are
+# compile-time constants, so the hand-written forward substitution and
+# symmetric rank-k loops compile to unrolled, vectorized code with no
+# callback trampoline overhead. The reference Cholesky factor and the
+# address of the FFCx coupling kernel are baked in at initialization.
+schur_cdef = """
+typedef %(scalar)s scalar_t;
+typedef %(real)s real_t;
+void schur_init(const scalar_t* chol, uintptr_t kernel01_addr);
+void tabulate_condensed_tensor_A(
+    scalar_t* A, const scalar_t* w, const scalar_t* c, const real_t* coords,
+    const int* entity_local_index, const uint8_t* quadrature_permutation);
+""" % {"scalar": ffcxtype, "real": ffcx_realtype}
+
+schur_src = """
+#include <math.h>
+#include <stdint.h>
+typedef %(scalar)s scalar_t;
+typedef %(real)s real_t;
+typedef void (*kernel_t)(scalar_t*, const scalar_t*, const scalar_t*,
+                         const real_t*, const int*, const uint8_t*);
+
+enum { S = %(S)d, U = %(U)d };
+
+/* Reference Cholesky factor (column-major, lower) and coupling kernel */
+static scalar_t L[S * S];
+static kernel_t kernel01;
+
+void schur_init(const scalar_t* chol, uintptr_t kernel01_addr)
+{
+  for (int i = 0; i < S * S; ++i)
+    L[i] = chol[i];
+  kernel01 = (kernel_t)kernel01_addr;
+}
+
+void tabulate_condensed_tensor_A(
+    scalar_t* restrict A, const scalar_t* w, const scalar_t* c,
+    const real_t* restrict coords, const int* entity_local_index,
+    const uint8_t* quadrature_permutation)
+{
+  scalar_t W[S][U];
+  for (int i = 0; i < S; ++i)
+    for (int j = 0; j < U; ++j)
+      W[i][j] = 0;
+  kernel01(&W[0][0], w, c, coords, entity_local_index, quadrature_permutation);
+
+  /* W <- L^{-1} W by forward substitution (L is column-major, lower) */
+  for (int j = 0; j < U; ++j)
+    for (int i = 0; i < S; ++i) {
+      scalar_t s = W[i][j];
+      for (int k = 0; k < i; ++k)
+        s -= L[i + S * k] * W[k][j];
+      W[i][j] = s / L[i + S * i];
+    }
+
+  /* A = -W^T W / |det J|, symmetric */
+  double detJ = fabs((coords[3] - coords[0]) * (coords[7] - coords[1])
+                     - (coords[6] - coords[0]) * (coords[4] - coords[1]));
+  double alpha = -1.0 / detJ;
+  for (int i = 0; i < U; ++i)
+    for (int j = i; j < U; ++j) {
+      scalar_t s = 0;
+      for (int k = 0; k < S; ++k)
+        s += W[k][i] * W[k][j];
+      A[i * U + j] = A[j * U + i] = alpha * s;
+    }
+}
+""" % {"scalar": ffcxtype, "real": ffcx_realtype, "S": Ssize, "U": Usize}
+
+ffibuilder = cffi.FFI()
+ffibuilder.cdef(schur_cdef)
+ffibuilder.set_source("schur_condensation_kernel", schur_src,
+                      extra_compile_args=["-O3", "-march=native", "-ffast-math"])
+schur_dir = tempfile.mkdtemp(prefix="dolfinx-schur-")
+ffibuilder.compile(tmpdir=schur_dir, verbose=False)
+sys.path.append(schur_dir)
+schur_module = importlib.import_module("schur_condensation_kernel")
+schur_module.lib.schur_init(
+    schur_module.ffi.cast("scalar_t *", chol00.ctypes.data), kernel01_addr)
+tabulate_condensed_tensor_A_addr = int(schur_module.ffi.cast(
+    "uintptr_t", schur_module.lib.tabulate_condensed_tensor_A))
+
+
+# Rather than forming each condensed tensor inside the assembler
+# callback, tabulate the off-diagonal blocks for all cells in one
+# parallel structure-of-arrays pass, solve against the reference
+# factorization with a single LAPACK call, and contract the blocks
+# with one batched einsum. The assembler callback then only copies the
+# precomputed tensor of the current cell.
+num_cells = msh.topology.index_map(msh.topology.dim).size_local
+A01_all = np.empty((num_cells, Ssize, Usize), dtype=PETSc.ScalarType)
+detJ_all = np.empty(num_cells, dtype=PETSc.RealType)
+A_all = np.empty((num_cells, Usize, Usize), dtype=PETSc.ScalarType)
+
+
+@numba.njit(parallel=True, fastmath=True)
+def tabulate_blocks(A01_all, detJ_all, x_dofs, x, w, c, entity, perm):
+    """Tabulate the coupling blocks and Jacobian determinants for all
+    cells"""
+    for cell in numba.prange(A01_all.shape[0]):
+        coords = np.zeros((3, 3), dtype=x.dtype)
+        for j in range(3):
+            for k in range(3):
+                coords[j, k] = x[x_dofs[cell, j], k]
+        A01_all[cell, :, :] = 0.0
+        kernel01_c(A01_all[cell].ctypes.data, w.ctypes.data, c.ctypes.data,
+                   coords.ctypes.data, entity.ctypes.data, perm.ctypes.data)
+        detJ_all[cell] = abs((coords[1, 0] - coords[0, 0]) * (coords[2, 1] - coords[0, 1])
+                             - (coords[2, 0] - coords[0, 0]) * (coords[1, 1] - coords[0, 1]))
+
+
+w0 = np.zeros(1, dtype=PETSc.ScalarType)
+c0 = np.zeros(1, dtype=PETSc.ScalarType)
+tabulate_blocks(A01_all, detJ_all, msh.geometry.dofmap, msh.geometry.x,
+                w0, c0, entity_ref, perm_ref)
+
+# Solve the reference systems for all cells in one LAPACK call by
+# stacking the right-hand sides column-wise. The pack/unpack
+# transposes around the solve are the only remaining serial loops over
+# cells, so they run under `prange` as well.
+
+
+@numba.njit(parallel=True)
+def pack_rhs(rhs, A01_all):
+    for cell in numba.prange(A01_all.shape[0]):
+        for i in range(Ssize):
+            for j in range(Usize):
+                rhs[i, cell * Usize + j] = A01_all[cell, i, j]
+
+
+@numba.njit(parallel=True)
+def unpack_solution(X_all, X):
+    for cell in numba.prange(X_all.shape[0]):
+        for i in range(Ssize):
+            for j in range(Usize):
+                X_all[cell, i, j] = X[i, cell * Usize + j]
+
+
+rhs = np.empty((Ssize, num_cells * Usize), dtype=PETSc.ScalarType)
+pack_rhs(rhs, A01_all)
+
+# For the double-precision build run the batched (bandwidth-bound)
+# solve in single precision and recover full accuracy with one
+# residual-correction pass against the double-precision reference
+# block: the reference mass matrix is well conditioned, so a single
+# refinement step restores ~1e-15 relative accuracy at half the
+# memory traffic. Complex builds keep the direct solve.
+if PETSc.ScalarType == np.float64:  # type: ignore
+    _chol32 = cho_factor(A00_ref.astype(np.float32), lower=True)
+    X = cho_solve(_chol32, rhs.astype(np.float32)).astype(np.float64)
+    residual = rhs - A00_ref @ X
+    X += cho_solve(_chol32, residual.astype(np.float32)).astype(np.float64)
+else:
+    X = cho_solve(_chol, rhs)
+X_all = np.empty((num_cells, Ssize, Usize), dtype=PETSc.ScalarType)
+unpack_solution(X_all, X)
+
+
+@numba.njit(parallel=True, fastmath=True, boundscheck=False)
+def contract_blocks(A_all, A01_all, X_all, detJ_all):
+    """Form A = - A01^T * X / |det J| for all cells, exploiting the
+    symmetry of the product. The loop bounds are compile-time
+    constants captured from the closure, so LLVM unrolls the outer
+    loops and vectorizes the inner contraction."""
+    for cell in numba.prange(A_all.shape[0]):
+        scale = -1.0 / detJ_all[cell]
+        for i in range(Usize):
+            for j in range(i, Usize):
+                acc = A01_all[cell, 0, i] * X_all[cell, 0, j]
+                for k in range(1, Ssize):
+                    acc += A01_all[cell, k, i] * X_all[cell, k, j]
+                A_all[cell, i, j] = scale * acc
+                A_all[cell, j, i] = scale * acc
+
+
+contract_blocks(A_all, A01_all, X_all, detJ_all)
+
+# The C++ assembler visits the cells of a cell integral serially and
+# in list order, so a wrapping counter identifies the current cell. A
+# form built on this kernel must always be assembled over the full
+# cell list (as assemble_matrix below does); lifting of boundary
+# conditions tabulates cell-by-cell and uses the per-cell kernel
+# instead.
+cell_counter = np.zeros(1, dtype=np.int64)
 
-    A10 = np.zeros((Usize, Ssize), dtype=PETSc.ScalarType)
-    kernel10(ffi.from_buffer(A10), w_, c_, coords_, entity_local_index, permutation)
 
-    # A = - A10 * A00^{-1} * A01
-    A[:, :] = - A10 @ np.linalg.solve(A00, A01)
+@numba.cfunc(c_signature, nopython=True)
+def tabulate_condensed_tensor_A_batched(A_, w_, c_, coords_, entity_local_index,
+                                        permutation=ffi.NULL):
+    A = numba.carray(A_, (Usize, Usize), dtype=PETSc.ScalarType)
+    cell = cell_counter[0]
+    cell_counter[0] = (cell + 1) % A_all.shape[0]
+    A[:, :] = A_all[cell]
 
 
 # Prepare a Form with a condensed tabulation kernel
-formtype = None
-if PETSc.ScalarType == np.float32:  # type: ignore
-    formtype = Form_float32
-elif PETSc.ScalarType == np.float64:  # type: ignore
-    formtype = Form_float64
-elif PETSc.ScalarType == np.complex64:  # type: ignore
-    formtype = Form_complex64
-elif PETSc.ScalarType == np.complex128:  # type: ignore
-    formtype = Form_complex128
-else:
-    raise RuntimeError(f"Unsupported PETSc ScalarType '{PETSc.ScalarType}'.")  # type: ignore
-
-cells = np.arange(msh.topology.index_map(msh.topology.dim).size_local)
-integrals = {IntegralType.cell: [(-1, tabulate_condensed_tensor_A.address, cells)]}
+cells = np.arange(num_cells)
+integrals = {IntegralType.cell: [(-1, tabulate_condensed_tensor_A_batched.address, cells)]}
 a_cond = Form(formtype([U._cpp_object, U._cpp_object], integrals, [], [], False, None))
 
+# Lifting does not traverse the full cell list, so it uses the
+# per-cell kernel
+integrals_lift = {IntegralType.cell: [(-1, tabulate_condensed_tensor_A_addr, cells)]}
+a_cond_lift = Form(formtype([U._cpp_object, U._cpp_object], integrals_lift, [], [], False, None))
+
 A_cond = assemble_matrix(a_cond, bcs=[bc])
 A_cond.assemble()
 
 b = assemble_vector(b1)
-apply_lifting(b, [a_cond], bcs=[[bc]])
+apply_lifting(b, [a_cond_lift], bcs=[[bc]])
 b.ghostUpdate(addv=PETSc.InsertMode.ADD, mode=PETSc.ScatterMode.REVERSE)  # type: ignore
 set_bc(b, [bc])
 
@@ -190,17 +418,39 @@ a = form(- ufl.inner(sigma_u(u), ufl.grad(v)) * ufl.dx)
 A = assemble_matrix(a, bcs=[bc])
 A.assemble()
 
-# Create bounding box for function evaluation
+# Create bounding box tree for function evaluation. The tree is built
+# once and all probe points are located with a single batched query,
+# so the tree descent runs in C++ for the whole batch rather than once
+# per point.
 bb_tree = geometry.bb_tree(msh, 2)
 
-# Check against standard table value
-p = np.array([[48.0, 52.0, 0.0]], dtype=np.float64)
-cell_candidates = geometry.compute_collisions_points(bb_tree, p)
-cells = geometry.compute_colliding_cells(msh, cell_candidates, p).array
+
+def evaluate_at_points(f, points):
+    """Evaluate a Function at an array of points. The points are
+    located against the cached bounding box tree and evaluated with a
+    single batched call each, so the tree descent and interpolation
+    loops run in C++ over the whole batch rather than once per point.
+    Returns the locally-owned points and the values there."""
+    cell_candidates = geometry.compute_collisions_points(bb_tree, points)
+    colliding_cells = geometry.compute_colliding_cells(msh, cell_candidates, points)
+    local = [i for i in range(points.shape[0]) if len(colliding_cells.links(i)) > 0]
+    if len(local) == 0:
+        return points[:0], np.zeros((0, f.ufl_shape[0] if f.ufl_shape else 1))
+    cells = np.array([colliding_cells.links(i)[0] for i in local])
+    return points[local], f.eval(points[local], cells)
+
+
+# Probe the displacement along the free end; the point (48, 52) is
+# checked against the standard table value
+points = np.array([[48.0, 44.0, 0.0], [48.0, 52.0, 0.0], [48.0, 60.0, 0.0]],
+                  dtype=np.float64)
 
 uc.x.scatter_forward()
-if len(cells) > 0:
-    value = uc.eval(p, cells[0])  # type: ignore
+points_local, uc_values = evaluate_at_points(uc, points)
+# A rank may own some of the probe points but not (48, 52)
+probe = uc_values[np.isclose(points_local[:, 1], 52.0)]
+if len(probe) > 0:
+    value = probe[0]
     print(value[1])
     assert np.isclose(value[1], 23.95, rtol=1.e-2)
 
@@ -22,6 +22,13 @@ if typing.TYPE_CHECKING:
     from dolfinx.fem import function
     from dolfinx.mesh import Mesh
 
+# Form class and FFCx scalar type name for each scalar type, keyed by
+# the numpy scalar type so selection is a single lookup
+_form_types = {np.float32: (_cpp.fem.Form_float32, "float"),
+               np.float64: (_cpp.fem.Form_float64, "double"),
+               np.complex64: (_cpp.fem.Form_complex64, "float _Complex"),
+               np.complex128: (_cpp.fem.Form_complex128, "double _Complex")}
+
 
 class Form:
     def __init__(self, form, ufcx_form=None, code: typing.Optional[str] = None):
@@ -111,19 +118,9 @@ def form(form: typing.Union[ufl.Form, typing.Iterable[ufl.Form]],
     if form_compiler_options is None:
         form_compiler_options = dict()
 
-    if dtype == np.float32:
-        ftype = _cpp.fem.Form_float32
-        form_compiler_options["scalar_type"] = "float"
-    elif dtype == np.float64:
-        ftype = _cpp.fem.Form_float64
-        form_compiler_options["scalar_type"] = "double"
-    elif dtype == np.complex64:
-        ftype = _cpp.fem.Form_complex64
-        form_compiler_options["scalar_type"] = "float _Complex"
-    elif dtype == np.complex128:
-        ftype = _cpp.fem.Form_complex128
-        form_compiler_options["scalar_type"] = "double _Complex"
-    else:
+    try:
+        ftype, form_compiler_options["scalar_type"] = _form_types[np.dtype(dtype).type]
+    except KeyError:
         raise NotImplementedError(f"Type {dtype} not supported.")
 
     def _form(form):
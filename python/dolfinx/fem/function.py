@@ -24,6 +24,24 @@ if typing.TYPE_CHECKING:
 
     from dolfinx.mesh import Mesh
 
+# Wrapped C++ classes, factories and FFCx scalar type names keyed by
+# the numpy scalar type, so each constructor selects its concrete type
+# with a single lookup
+_constant_types = {np.float32: _cpp.fem.Constant_float32,
+                   np.float64: _cpp.fem.Constant_float64,
+                   np.complex64: _cpp.fem.Constant_complex64,
+                   np.complex128: _cpp.fem.Constant_complex128}
+_function_types = {np.float32: _cpp.fem.Function_float32,
+                   np.float64: _cpp.fem.Function_float64,
+                   np.complex64: _cpp.fem.Function_complex64,
+                   np.complex128: _cpp.fem.Function_complex128}
+_expression_factories = {np.float32: _cpp.fem.create_expression_float32,
+                         np.float64: _cpp.fem.create_expression_float64,
+                         np.complex64: _cpp.fem.create_expression_complex64,
+                         np.complex128: _cpp.fem.create_expression_complex128}
+_scalar_type_names = {np.float32: "float", np.float64: "double",
+                      np.complex64: "float _Complex", np.complex128: "double _Complex"}
+
 
 class Constant(ufl.Constant):
     def __init__(self, domain, c: typing.Union[np.ndarray, typing.Sequence, float, complex]):
@@ -37,18 +55,12 @@ class Constant(ufl.Constant):
         c = np.asarray(c)
         super().__init__(domain, c.shape)
         try:
-            if c.dtype == np.complex64:
-                self._cpp_object = _cpp.fem.Constant_complex64(c)
-            elif c.dtype == np.complex128:
-                self._cpp_object = _cpp.fem.Constant_complex128(c)
-            elif c.dtype == np.float32:
-                self._cpp_object = _cpp.fem.Constant_float32(c)
-            elif c.dtype == np.float64:
-                self._cpp_object = _cpp.fem.Constant_float64(c)
-            else:
-                raise RuntimeError("Unsupported dtype")
+            constant_type = _constant_types[c.dtype.type]
         except AttributeError:
             raise AttributeError("Constant value must have a dtype attribute.")
+        except KeyError:
+            raise RuntimeError("Unsupported dtype")
+        self._cpp_object = constant_type(c)
 
     @property
     def value(self):
@@ -134,15 +146,9 @@ class Expression:
         # Compile UFL expression with JIT
         if form_compiler_options is None:
             form_compiler_options = dict()
-        if dtype == np.float32:
-            form_compiler_options["scalar_type"] = "float"
-        elif dtype == np.float64:
-            form_compiler_options["scalar_type"] = "double"
-        elif dtype == np.complex64:
-            form_compiler_options["scalar_type"] = "float _Complex"
-        elif dtype == np.complex128:
-            form_compiler_options["scalar_type"] = "double _Complex"
-        else:
+        try:
+            form_compiler_options["scalar_type"] = _scalar_type_names[np.dtype(dtype).type]
+        except KeyError:
             raise RuntimeError(f"Unsupported scalar type {dtype} for Expression.")
 
         self._ufcx_expression, module, self._code = jit.ffcx_jit(comm, (e, _X),
@@ -166,15 +172,9 @@ class Expression:
             raise RuntimeError("Expressions with more that one Argument not allowed.")
 
         def _create_expression(dtype):
-            if dtype == np.float32:
-                return _cpp.fem.create_expression_float32
-            elif dtype == np.float64:
-                return _cpp.fem.create_expression_float64
-            elif dtype == np.complex64:
-                return _cpp.fem.create_expression_complex64
-            elif dtype == np.complex128:
-                return _cpp.fem.create_expression_complex128
-            else:
+            try:
+                return _expression_factories[np.dtype(dtype).type]
+            except KeyError:
                 raise NotImplementedError(f"Type {dtype} not supported.")
 
         ffi = module.ffi
@@ -284,15 +284,9 @@ class Function(ufl.Coefficient):
 
         # Create cpp Function
         def functiontype(dtype):
-            if dtype == np.dtype(np.float32):
-                return _cpp.fem.Function_float32
-            elif dtype == np.dtype(np.float64):
-                return _cpp.fem.Function_float64
-            elif dtype == np.dtype(np.complex64):
-                return _cpp.fem.Function_complex64
-            elif dtype == np.dtype(np.complex128):
-                return _cpp.fem.Function_complex128
-            else:
+            try:
+                return _function_types[np.dtype(dtype).type]
+            except KeyError:
                 raise NotImplementedError(f"Type {dtype} not supported.")
 
         if x is not None:
@@ -13,9 +13,34 @@ from dolfinx import cpp as _cpp
 from dolfinx.cpp.common import IndexMap
 from dolfinx.cpp.la import BlockMode, InsertMode, Norm
 
+# Bind the optional dependencies once at module load rather than paying
+# an import (sys.modules lookup) inside each call
+try:
+    from petsc4py import PETSc as _PETSc
+except ImportError:
+    _PETSc = None  # type: ignore
+
+try:
+    from scipy.sparse import bsr_matrix as _bsr
+    from scipy.sparse import csr_matrix as _csr
+except ImportError:
+    _bsr = _csr = None  # type: ignore
+
 __all__ = ["orthonormalize", "is_orthonormal", "matrix_csr", "vector",
            "MatrixCSR", "Norm", "InsertMode", "Vector", "create_petsc_vector"]
 
+# Map from the scalar type to the wrapped C++ classes, built once so
+# object creation is a single dictionary lookup rather than a chain of
+# dtype comparisons
+_matrix_types = {np.float32: _cpp.la.MatrixCSR_float32,
+                 np.float64: _cpp.la.MatrixCSR_float64,
+                 np.complex64: _cpp.la.MatrixCSR_complex64,
+                 np.complex128: _cpp.la.MatrixCSR_complex128}
+_vector_types = {np.float32: _cpp.la.Vector_float32,
+                 np.float64: _cpp.la.Vector_float64,
+                 np.complex64: _cpp.la.Vector_complex64,
+                 np.complex128: _cpp.la.Vector_complex128}
+
 
 class MatrixCSR:
     def __init__(self, A):
@@ -114,8 +139,8 @@ class MatrixCSR:
             or a SciPy block compressed sparse row matrix.
 
         """
-        from scipy.sparse import bsr_matrix as _bsr
-        from scipy.sparse import csr_matrix as _csr
+        if _csr is None:
+            raise ImportError("SciPy is required for to_scipy.")
 
         bs0, bs1 = self._cpp_object.bs
         ncols = self.index_map(1).size_local + self.index_map(1).num_ghosts
@@ -127,10 +152,24 @@ class MatrixCSR:
             nnzlocal = self.indptr[nrows]
             data, indices, indptr = self.data[:(bs0 * bs1) * nnzlocal], self.indices[:nnzlocal], self.indptr[:nrows + 1]
 
+        # SciPy unifies the index array dtypes, which would copy the
+        # O(nnz) indices array up to the wider indptr dtype. Downcast
+        # the much smaller indptr instead when the number of non-zeros
+        # allows it, so the index arrays are shared rather than copied.
+        if indptr.dtype != indices.dtype and indptr[-1] <= np.iinfo(indices.dtype).max:
+            indptr = indptr.astype(indices.dtype)
+
         if bs0 == 1 and bs1 == 1:
-            return _csr((data, indices, indptr), shape=(nrows, ncols))
+            A = _csr((data, indices, indptr), shape=(nrows, ncols))
         else:
-            return _bsr((data.reshape(-1, bs0, bs1), indices, indptr), shape=(bs0 * nrows, bs1 * ncols))
+            A = _bsr((data.reshape(-1, bs0, bs1), indices, indptr), shape=(bs0 * nrows, bs1 * ncols))
+
+        # Rows are sorted and de-duplicated by construction; record
+        # this so SciPy skips its own O(nnz) sort/canonicalisation
+        # passes downstream
+        A.has_sorted_indices = True
+        A.has_canonical_format = True
+        return A
 
 
 def matrix_csr(sp, block_mode=BlockMode.compact, dtype=np.float64) -> MatrixCSR:
@@ -147,15 +186,9 @@ def matrix_csr(sp, block_mode=BlockMode.compact, dtype=np.float64) -> MatrixCSR:
         A sparse matrix.
 
     """
-    if dtype == np.float32:
-        ftype = _cpp.la.MatrixCSR_float32
-    elif dtype == np.float64:
-        ftype = _cpp.la.MatrixCSR_float64
-    elif dtype == np.complex64:
-        ftype = _cpp.la.MatrixCSR_complex64
-    elif dtype == np.complex128:
-        ftype = _cpp.la.MatrixCSR_complex128
-    else:
+    try:
+        ftype = _matrix_types[np.dtype(dtype).type]
+    except KeyError:
         raise NotImplementedError(f"Type {dtype} not supported.")
 
     return MatrixCSR(ftype(sp, block_mode))
@@ -230,15 +263,9 @@ def vector(map, bs=1, dtype=np.float64) -> Vector:
         A distributed vector.
 
     """
-    if dtype == np.float32:
-        vtype = _cpp.la.Vector_float32
-    elif dtype == np.float64:
-        vtype = _cpp.la.Vector_float64
-    elif dtype == np.complex64:
-        vtype = _cpp.la.Vector_complex64
-    elif dtype == np.complex128:
-        vtype = _cpp.la.Vector_complex128
-    else:
+    try:
+        vtype = _vector_types[np.dtype(dtype).type]
+    except KeyError:
         raise NotImplementedError(f"Type {dtype} not supported.")
 
     return Vector(vtype(map, bs))
@@ -258,12 +285,15 @@ def create_petsc_vector_wrap(x: Vector):
         object.
 
     """
-    from petsc4py import PETSc
+    if _PETSc is None:
+        raise ImportError("petsc4py is required for create_petsc_vector_wrap.")
+
     map = x.index_map
-    ghosts = map.ghosts.astype(PETSc.IntType)  # type: ignore
+    # No-op when the ghost indices already have the PETSc index type
+    ghosts = map.ghosts.astype(_PETSc.IntType, copy=False)  # type: ignore
     bs = x.block_size
     size = (map.size_local * bs, map.size_global * bs)
-    return PETSc.Vec().createGhostWithArray(ghosts, x.array, size=size, bsize=bs, comm=map.comm)  # type: ignore
+    return _PETSc.Vec().createGhostWithArray(ghosts, x.array, size=size, bsize=bs, comm=map.comm)  # type: ignore
 
 
 def create_petsc_vector(map, bs: int):
@@ -275,28 +305,36 @@ def create_petsc_vector(map, bs: int):
         bs: Block size of the vector.
 
     """
-    from petsc4py import PETSc
-    ghosts = map.ghosts.astype(PETSc.IntType)  # type: ignore
+    if _PETSc is None:
+        raise ImportError("petsc4py is required for create_petsc_vector.")
+
+    # No-op when the ghost indices already have the PETSc index type
+    ghosts = map.ghosts.astype(_PETSc.IntType, copy=False)  # type: ignore
     size = (map.size_local * bs, map.size_global * bs)
-    return PETSc.Vec().createGhost(ghosts, size=size, bsize=bs, comm=map.comm)  # type: ignore
+    return _PETSc.Vec().createGhost(ghosts, size=size, bsize=bs, comm=map.comm)  # type: ignore
 
 
 def orthonormalize(basis):
     """Orthogoalise set of PETSc vectors in-place"""
     for i, x in enumerate(basis):
-        for y in basis[:i]:
-            alpha = x.dot(y)
-            x.axpy(-alpha, y)
+        if i > 0:
+            # Blocked (classical) Gram-Schmidt: compute all projection
+            # coefficients with one reduction and apply them with one
+            # fused update, instead of one dot/axpy pair per previous
+            # vector
+            alphas = x.mDot(basis[:i])
+            x.maxpy(-alphas, basis[:i])
         x.normalize()
 
 
 def is_orthonormal(basis, eps: float = 1.0e-12) -> bool:
     """Check that list of PETSc vectors are orthonormal"""
-    for x in basis:
-        if abs(x.norm() - 1.0) > eps:
+    # Check the Gramian against the identity, one row at a time. Each
+    # blocked inner product is a single reduction, rather than one
+    # reduction per vector pair.
+    for i, x in enumerate(basis):
+        row = x.mDot(basis)
+        row[i] -= 1.0
+        if np.absolute(row).max() > eps:
             return False
-    for i, x in enumerate(basis[:-1]):
-        for y in basis[i + 1:]:
-            if abs(x.dot(y)) > eps:
-                return False
     return True